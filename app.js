@@ -57,6 +57,8 @@ const YOUTUBE_URL_PATTERN = /^https?:\/\/(www\.)?(youtube\.com|youtu\.be|music\.
 const HISTORY_MAX_ITEMS = 50;
 const HISTORY_STORAGE_KEY = 'downloadHistory';
 const FAVORITES_STORAGE_KEY = 'favorites';
+const SPRITE_CHUNK_SIZE = 100; // Thumbnails per /api/thumb-sprite request (server maximum)
+const SPRITE_TILE_WIDTH = 120;
 
 // ========================================
 // Language / i18n
@@ -911,7 +913,7 @@ function renderPlaylistSelector(videos) {
                     <path d="M20.84 4.61a5.5 5.5 0 0 0-7.78 0L12 5.67l-1.06-1.06a5.5 5.5 0 0 0-7.78 7.78l1.06 1.06L12 21.23l7.78-7.78 1.06-1.06a5.5 5.5 0 0 0 0-7.78z"/>
                 </svg>
             </button>
-            <img class="playlist-thumbnail" src="${video.thumbnail}" alt="${video.title}" loading="lazy">
+            <div class="playlist-thumbnail" role="img" aria-label="${video.title}"></div>
             <div class="playlist-info">
                 <div class="playlist-item-title">${video.title}</div>
                 <div class="playlist-meta">
@@ -948,10 +950,64 @@ function renderPlaylistSelector(videos) {
         playlistList.appendChild(item);
     });
 
+    loadPlaylistSprites(videos);
     updateSelectedCount();
     showPlaylistSelector();
 }
 
+// Loads playlist thumbnails as sprites (one request per SPRITE_CHUNK_SIZE videos),
+// each chunk only once one of its items scrolls into view
+function loadPlaylistSprites(videos) {
+    const thumbs = Array.from(playlistList.querySelectorAll('.playlist-thumbnail'));
+    const loadedChunks = new Set();
+
+    const observer = new IntersectionObserver((entries) => {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            const chunk = Math.floor(thumbs.indexOf(entry.target) / SPRITE_CHUNK_SIZE);
+            if (loadedChunks.has(chunk)) return;
+            loadedChunks.add(chunk);
+
+            const start = chunk * SPRITE_CHUNK_SIZE;
+            const chunkThumbs = thumbs.slice(start, start + SPRITE_CHUNK_SIZE);
+            chunkThumbs.forEach(thumb => observer.unobserve(thumb));
+            loadSpriteChunk(videos.slice(start, start + SPRITE_CHUNK_SIZE), chunkThumbs);
+        });
+    }, { root: playlistList, rootMargin: '200px' });
+
+    thumbs.forEach(thumb => observer.observe(thumb));
+}
+
+async function loadSpriteChunk(videos, thumbs) {
+    try {
+        const ids = videos.map(video => video.id).join(',');
+        const response = await fetch(`${API_URL}/api/thumb-sprite?ids=${ids}&w=${SPRITE_TILE_WIDTH}`);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+
+        const [tileWidth, tileHeight] = response.headers.get('X-Sprite-Tile').split('x').map(Number);
+        const columns = Number(response.headers.get('X-Sprite-Columns'));
+        const rows = Math.ceil(videos.length / columns);
+        const spriteUrl = URL.createObjectURL(await response.blob());
+
+        thumbs.forEach((thumb, index) => {
+            // Scale the sprite so one tile fills the thumbnail box
+            const scale = thumb.clientWidth / tileWidth;
+            thumb.style.backgroundImage = `url(${spriteUrl})`;
+            thumb.style.backgroundRepeat = 'no-repeat';
+            thumb.style.backgroundSize = `${columns * tileWidth * scale}px ${rows * tileHeight * scale}px`;
+            thumb.style.backgroundPosition = `${-(index % columns) * tileWidth * scale}px ${-Math.floor(index / columns) * tileHeight * scale}px`;
+        });
+    } catch (error) {
+        // Sprites unavailable (e.g. no Pillow on the server): load thumbnails one by one
+        console.warn('Sprite load failed, using single thumbnails:', error);
+        thumbs.forEach((thumb, index) => {
+            thumb.style.backgroundImage = `url(${videos[index].thumbnail})`;
+            thumb.style.backgroundSize = 'cover';
+            thumb.style.backgroundPosition = 'center';
+        });
+    }
+}
+
 function updateSelectedCount() {
     const checkboxes = playlistList.querySelectorAll('.playlist-checkbox:checked');
     const count = checkboxes.length;
@@ -1107,7 +1163,7 @@ function addToHistory(video) {
     const entry = {
         id: video.id || extractVideoId(video.url),
         title: video.title,
-        thumbnail: video.thumbnail || `https://i.ytimg.com/vi/${video.id || extractVideoId(video.url)}/mqdefault.jpg`,
+        thumbnail: video.thumbnail || `${API_URL}/api/thumb/${video.id || extractVideoId(video.url)}?w=120`,
         channel: video.channel || 'Desconocido',
         url: video.url,
         downloadedAt: new Date().toISOString()
@@ -1259,7 +1315,7 @@ function toggleFavorite(video, btnElement) {
         const entry = {
             id: videoId,
             title: video.title,
-            thumbnail: video.thumbnail || `https://i.ytimg.com/vi/${videoId}/mqdefault.jpg`,
+            thumbnail: video.thumbnail || `${API_URL}/api/thumb/${videoId}?w=120`,
             channel: video.channel || 'Desconocido',
             url: video.url || `https://www.youtube.com/watch?v=${videoId}`,
             addedAt: new Date().toISOString(),
@@ -0,0 +1,150 @@
+"""
+YouTube Music Downloader - Command Line Batch Entry Point
+Downloads videos/playlists as MP3 files straight into a folder, using the
+same download engine as server.py (no HTTP, polling or ZIP step)
+
+Usage:
+    python -m cli URL [URL ...] [--file urls.txt] [--jobs 5] [--quality 192] [--output DIR]
+
+Progress is printed to stdout as one JSON object per line
+"""
+
+import argparse
+import concurrent.futures
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+import server
+
+
+# ========================================
+# Input Handling
+# ========================================
+
+def read_inputs(urls, url_file):
+    """Collects URLs from the command line and from a file (one per line, # for comments)"""
+    inputs = list(urls)
+    if url_file:
+        with open(url_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    inputs.append(line)
+    return inputs
+
+
+def resolve_videos(input_text):
+    """
+    Turns one input (video URL, playlist URL or search text) into the list of
+    videos the download engine expects; raises ValueError for invalid input
+    """
+    if server.is_search_query(input_text):
+        return [{'url': f"ytsearch:{input_text}", 'title': input_text}]
+
+    # Same rules as /api/start-download: Radio/Mix playlists cannot be downloaded
+    if re.search(r'list=(RD[a-zA-Z0-9_-]+)', input_text):
+        raise ValueError('Mix/Radio playlists cannot be downloaded')
+
+    content_type, content_id = server.validate_youtube_url(input_text)
+    if not content_type:
+        raise ValueError('Not a valid YouTube URL')
+
+    if content_type == 'playlist':
+        playlist_url = f"https://www.youtube.com/playlist?list={content_id}"
+        try:
+            videos = server.get_playlist_videos(playlist_url)
+        except RuntimeError as e:
+            raise ValueError(f'Could not list playlist: {e}')
+        except subprocess.TimeoutExpired:
+            raise ValueError('Listing the playlist took too long')
+        if not videos:
+            raise ValueError('Playlist is empty')
+        return videos
+
+    return [{'url': input_text, 'title': content_id}]
+
+
+def emit(event, **fields):
+    """Prints one machine-readable progress line"""
+    print(json.dumps({'event': event, **fields}, ensure_ascii=False), flush=True)
+
+
+# ========================================
+# Main Entry Point
+# ========================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m cli',
+        description='Download YouTube videos/playlists as MP3 files into a folder'
+    )
+    parser.add_argument('urls', nargs='*', help='Video URLs, playlist URLs or search text')
+    parser.add_argument('-f', '--file', help='File with one URL per line')
+    parser.add_argument('-j', '--jobs', type=int, default=server.MAX_WORKERS,
+                        help=f'Parallel downloads (default: {server.MAX_WORKERS})')
+    parser.add_argument('-q', '--quality', default='192', choices=['128', '192', '320'],
+                        help='MP3 bitrate in kbps (default: 192)')
+    parser.add_argument('-o', '--output', default='.', help='Output folder (default: current folder)')
+    parser.add_argument('--segmented', action='store_true',
+                        help='Fetch long tracks over parallel connections')
+    args = parser.parse_args(argv)
+
+    inputs = read_inputs(args.urls, args.file)
+    if not inputs:
+        parser.error('no URLs given (pass them as arguments or with --file)')
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    if args.segmented:
+        server.SEGMENTED_DOWNLOAD = True
+
+    output_folder = os.path.abspath(args.output)
+    os.makedirs(output_folder, exist_ok=True)
+    start_time = time.time()
+
+    # Expand playlists into individual tracks
+    videos = []
+    invalid_count = 0
+    for input_text in inputs:
+        try:
+            videos.extend(resolve_videos(input_text))
+        except ValueError as e:
+            invalid_count += 1
+            emit('invalid', input=input_text, error=str(e))
+
+    emit('start', tracks=len(videos), jobs=args.jobs, quality=args.quality, output=output_folder)
+
+    job_log = server.JobLog()
+    track_times = []
+
+    def report_track(done, total, video, ok, seconds):
+        track_times.append(seconds)
+        fields = {'done': done, 'total': total, 'title': video.get('title'), 'url': video.get('url'),
+                  'status': 'ok' if ok else 'error', 'seconds': round(seconds, 2)}
+        if not ok:
+            fields['error'] = job_log.last_error(video.get('title'))
+        emit('track', **fields)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        ok_count = server.download_batch(videos, output_folder, args.quality, job_log,
+                                         on_progress=report_track, pool=pool)
+
+    elapsed = time.time() - start_time
+    emit(
+        'summary',
+        tracks=len(videos),
+        ok=ok_count,
+        failed=len(videos) - ok_count,
+        invalid_inputs=invalid_count,
+        seconds=round(elapsed, 2),
+        avg_track_seconds=round(sum(track_times) / len(track_times), 2) if track_times else 0,
+        max_track_seconds=round(max(track_times), 2) if track_times else 0
+    )
+    return 0 if videos and ok_count == len(videos) and not invalid_count else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
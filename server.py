@@ -4,7 +4,10 @@ Uses yt-dlp to download YouTube videos/playlists as MP3 files
 With real-time progress updates via polling
 """
 
+import gzip
+import hashlib
 import json
+import mimetypes
 import os
 import re
 import shutil
@@ -13,11 +16,28 @@ import sys
 import tempfile
 import threading
 import time
+import unicodedata
 import uuid
+from collections import deque
 from datetime import datetime
 from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
 import concurrent.futures
+import http.client
+import io
+import urllib.error
+import urllib.parse
+import urllib.request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # Optional: brotli variants are skipped if the package is missing
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None  # Optional: thumbnails are served unresized if Pillow is missing
 
 # ========================================
 # Flask App Configuration
@@ -39,9 +59,69 @@ FFMPEG_DIR = os.path.join(SCRIPT_DIR, 'ffmpeg-master-latest-win64-gpl', 'bin')
 if os.path.exists(FFMPEG_DIR):
     os.environ['PATH'] = FFMPEG_DIR + os.pathsep + os.environ.get('PATH', '')
 
+# Segmented Download Configuration
+# Long tracks (mixes, podcasts) are fetched over several parallel connections
+# instead of yt-dlp's single one, then handed back to yt-dlp for conversion
+SEGMENTED_DOWNLOAD = False  # Set to True to enable the segmented fetcher
+SEGMENTED_MIN_DURATION = 1200  # Only tracks of 20+ minutes are segmented
+SEGMENTED_CONNECTIONS = 4  # Parallel connections per track
+SEGMENT_SIZE = 8 * 1024 * 1024  # 8 MB per byte range
+SEGMENT_RETRIES = 3  # Attempts per segment before giving up
+
+# Static Asset Configuration
+# Frontend files are copied under content-hashed names with gzip/brotli
+# variants, so browsers can cache them forever and fetch them compressed
+STATIC_ASSETS = ('app.js', 'styles.css')
+STATIC_BUILD_DIR = os.path.join(SCRIPT_DIR, '.static-build')
+STATIC_MAX_AGE = 31536000  # 1 year; the hashed name changes with the content
+
+# Manifest of built static assets (filled on first use or at startup)
+static_manifest = None
+static_manifest_lock = threading.Lock()
+
+# Thumbnail Proxy Configuration
+# Thumbnails are fetched from YouTube once and served from a local disk cache
+THUMB_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'youtube_downloader_thumbs')
+THUMB_CACHE_MAX_BYTES = 200 * 1024 * 1024  # Oldest files are evicted above 200 MB
+THUMB_WIDTHS = (120, 160, 320)  # Allowed resize widths (320 is the original)
+THUMB_LIST_WIDTH = 120  # Width used in search/playlist results (shown at 70px)
+THUMB_MAX_AGE = 7 * 24 * 3600  # Browser cache time for thumbnails
+SPRITE_MAX_IDS = 100  # Thumbnails per sprite request
+SPRITE_COLUMNS = 10
+
+# File Delivery Configuration
+# 'flask': stream through a Flask worker thread with send_file
+# 'x-accel-redirect': let nginx send the file (needs an internal location that
+#          maps X_ACCEL_PREFIX to TEMP_DIR)
+# 'x-sendfile': let Apache (mod_xsendfile) or lighttpd send the file
+DELIVERY_MODE = 'flask'
+X_ACCEL_PREFIX = '/protected-downloads/'
+DELIVERY_CLEANUP_DELAY = 3600  # Seconds to keep files after handing them to the proxy
+DELIVERY_ZIP_NAME = 'playlist.zip'  # Multi-track archive, built once per job folder
+
+# Job Log Configuration
+# yt-dlp output is streamed into a fixed-size buffer per job instead of
+# being held in memory or written to disk in full
+LOG_TAIL_LINES = 200  # Lines kept per job
+LOG_MAX_ERRORS = 50  # Structured errors kept per job
+LOG_LINE_MAX = 1000  # Longer lines are split
+LOG_TTL = 3600  # Logs of finished or failed jobs are dropped after 1 hour
+
 # Store for download progress
 download_progress = {}
 
+# Thumbnail cache state (approximate size on disk, per-video fetch locks)
+thumb_cache_size = None
+thumb_cache_lock = threading.Lock()
+thumb_fetch_locks = {}
+
+# Store for per-job yt-dlp output (download_id -> JobLog)
+download_logs = {}
+
+# Job folders with a delayed cleanup already scheduled (proxy delivery modes)
+pending_delivery_cleanups = set()
+delivery_cleanup_lock = threading.Lock()
+
 # ========================================
 # Utility Functions
 # ========================================
@@ -152,6 +232,878 @@ def get_playlist_count(url):
     return None
 
 
+def parse_video_entries(output):
+    """Parses yt-dlp --dump-json --flat-playlist output (one JSON object per line)"""
+    videos = []
+    for line in output.strip().split('\n'):
+        if line:
+            try:
+                video = json.loads(line)
+                # Extract relevant info
+                video_id = video.get('id', '')
+                if video_id:
+                    videos.append({
+                        'id': video_id,
+                        'title': video.get('title', 'Sin título'),
+                        'thumbnail': f"/api/thumb/{video_id}?w={THUMB_LIST_WIDTH}",
+                        'duration': video.get('duration', 0),
+                        'channel': video.get('channel', video.get('uploader', 'Canal desconocido')),
+                        'url': f"https://www.youtube.com/watch?v={video_id}"
+                    })
+            except json.JSONDecodeError:
+                continue
+    return videos
+
+
+def get_playlist_videos(playlist_url):
+    """
+    Lists the videos of a playlist without downloading them
+    Raises RuntimeError if yt-dlp fails, subprocess.TimeoutExpired if it hangs
+    """
+    result = subprocess.run(
+        [
+            sys.executable, '-m', 'yt_dlp',
+            playlist_url,
+            '--dump-json',
+            '--flat-playlist',
+            '--no-warnings',
+            '--no-download',
+        ],
+        capture_output=True,
+        text=True,
+        timeout=60,
+        encoding='utf-8',
+        errors='replace'
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    return parse_video_entries(result.stdout)
+
+
+# ========================================
+# Job Logs
+# ========================================
+
+# yt-dlp reports failures as "ERROR: [extractor] video_id: message"
+YTDLP_ERROR_RE = re.compile(r'^ERROR:\s*(?:\[(?P<extractor>[^\]]+)\]\s*)?(?:(?P<video_id>[\w-]{11}):\s*)?(?P<message>.*)$')
+
+
+class JobLog:
+    """
+    Fixed-size tail of the child process output for one download job
+    Lines beyond LOG_TAIL_LINES are dropped, so memory does not grow with
+    output volume; yt-dlp errors are also kept as structured entries
+    """
+
+    def __init__(self, max_lines=LOG_TAIL_LINES, max_errors=LOG_MAX_ERRORS):
+        self.lines = deque(maxlen=max_lines)
+        self.errors = deque(maxlen=max_errors)
+        self.total_lines = 0
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def append(self, text, source=None):
+        text = text.rstrip()
+        if not text:
+            return
+        line = f"[{source}] {text}" if source else text
+        with self._lock:
+            self.lines.append(line)
+            self.total_lines += 1
+            match = YTDLP_ERROR_RE.match(text)
+            if match:
+                self.errors.append({
+                    'source': source,
+                    'extractor': match.group('extractor'),
+                    'video_id': match.group('video_id'),
+                    'message': match.group('message'),
+                    'timestamp': datetime.now().isoformat()
+                })
+
+    def finish(self):
+        """Marks the job as ended (complete or failed) so its log can expire"""
+        self.finished_at = time.time()
+
+    def last_error(self, source=None):
+        """Returns the most recent error message (optionally for one source)"""
+        with self._lock:
+            for error in reversed(self.errors):
+                if source is None or error['source'] == source:
+                    return error['message']
+        return None
+
+    def tail(self, count=None):
+        """Returns the last count lines (all kept lines if count is None) and the errors"""
+        if count is not None:
+            count = max(1, min(count, self.lines.maxlen))
+        with self._lock:
+            lines = list(self.lines)
+            return {
+                'lines': lines[-count:] if count else lines,
+                'errors': list(self.errors),
+                'total_lines': self.total_lines,
+                'dropped_lines': self.total_lines - len(lines)
+            }
+
+
+def register_job_log(download_id):
+    """
+    Creates the JobLog for a new download job
+    Logs of jobs that ended more than LOG_TTL ago are dropped at the same time,
+    including failed jobs whose files are never fetched
+    """
+    now = time.time()
+    for job_id, job_log in list(download_logs.items()):
+        if job_log.finished_at and now - job_log.finished_at > LOG_TTL:
+            download_logs.pop(job_id, None)
+    job_log = download_logs[download_id] = JobLog()
+    return job_log
+
+
+def run_logged(cmd, cwd, job_log, timeout=None, source=None):
+    """
+    Runs a command, streaming its combined stdout/stderr into job_log line by line
+    Returns the exit code; raises subprocess.TimeoutExpired like subprocess.run
+    """
+    proc = subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        encoding='utf-8',
+        errors='replace'
+    )
+    timed_out = threading.Event()
+
+    def kill_on_timeout():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill_on_timeout) if timeout else None
+    if timer:
+        timer.daemon = True
+        timer.start()
+    try:
+        for line in iter(lambda: proc.stdout.readline(LOG_LINE_MAX), ''):
+            job_log.append(line, source)
+        proc.wait()
+    finally:
+        if timer:
+            timer.cancel()
+        proc.stdout.close()
+
+    if timed_out.is_set():
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return proc.returncode
+
+
+# ========================================
+# Segmented Downloader
+# ========================================
+
+class SegmentedDownloadError(Exception):
+    """Raised when a stream cannot be fetched in byte ranges"""
+
+
+class SegmentedDownloader:
+    """
+    Downloads a single HTTP(S) resource as parallel byte ranges
+    Every worker thread keeps one persistent connection that is reused for
+    all of its segments, and writes straight into a preallocated file
+    """
+
+    REDIRECT_CODES = (301, 302, 303, 307, 308)
+    READ_CHUNK = 64 * 1024
+
+    def __init__(self, url, headers=None, connections=SEGMENTED_CONNECTIONS,
+                 segment_size=SEGMENT_SIZE, retries=SEGMENT_RETRIES, timeout=30):
+        self.headers = dict(headers or {})
+        self.headers['Accept-Encoding'] = 'identity'  # Byte ranges must match the raw file
+        self.connections = max(1, connections)
+        self.segment_size = max(1, segment_size)
+        self.retries = max(1, retries)
+        self.timeout = timeout
+        self._set_url(url)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._open_resources = []
+
+    def _set_url(self, url):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise SegmentedDownloadError(f'Unsupported URL scheme: {parts.scheme}')
+        self.url = url
+        self._scheme = parts.scheme
+        self._netloc = parts.netloc
+        self._path = urllib.parse.urlunsplit(('', '', parts.path or '/', parts.query, ''))
+
+    def _get_connection(self):
+        """Returns this thread's pooled connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if self._scheme == 'https' else http.client.HTTPConnection
+            conn = conn_class(self._netloc, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._open_resources.append(conn)
+        return conn
+
+    def _drop_connection(self):
+        """Discards this thread's connection after an error so the next attempt reconnects"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _get_file(self, path):
+        """Returns this thread's handle on the output file"""
+        fh = getattr(self._local, 'file', None)
+        if fh is None:
+            fh = open(path, 'r+b')
+            self._local.file = fh
+            with self._lock:
+                self._open_resources.append(fh)
+        return fh
+
+    def _request_range(self, start, end):
+        conn = self._get_connection()
+        headers = dict(self.headers)
+        headers['Range'] = f'bytes={start}-{end}'
+        conn.request('GET', self._path, headers=headers)
+        return conn.getresponse()
+
+    def probe_size(self):
+        """
+        Follows redirects and checks that the server honours byte ranges
+        Returns the total size of the resource in bytes
+        """
+        for _ in range(5):
+            response = self._request_range(0, 0)
+            response.read()
+            if response.status in self.REDIRECT_CODES:
+                location = response.getheader('Location')
+                self._drop_connection()
+                if not location:
+                    raise SegmentedDownloadError('Redirect without Location header')
+                self._set_url(urllib.parse.urljoin(self.url, location))
+                continue
+            if response.status != 206:
+                raise SegmentedDownloadError(f'Server does not support byte ranges (HTTP {response.status})')
+            match = re.match(r'bytes\s+\d+-\d+/(\d+)', response.getheader('Content-Range', ''))
+            if not match:
+                raise SegmentedDownloadError('Missing total size in Content-Range')
+            return int(match.group(1))
+        raise SegmentedDownloadError('Too many redirects')
+
+    def _fetch_segment(self, path, start, end):
+        """Downloads one byte range, retrying it on its own if it fails"""
+        expected = end - start + 1
+        for attempt in range(1, self.retries + 1):
+            try:
+                response = self._request_range(start, end)
+                if response.status != 206:
+                    response.read()
+                    raise SegmentedDownloadError(f'Unexpected HTTP {response.status} for bytes {start}-{end}')
+                fh = self._get_file(path)
+                fh.seek(start)
+                received = 0
+                while received < expected:
+                    chunk = response.read(min(self.READ_CHUNK, expected - received))
+                    if not chunk:
+                        break
+                    fh.write(chunk)
+                    received += len(chunk)
+                if received != expected:
+                    raise SegmentedDownloadError(f'Short read for bytes {start}-{end}: {received}/{expected}')
+                return expected
+            except (OSError, http.client.HTTPException, SegmentedDownloadError) as e:
+                self._drop_connection()
+                if attempt == self.retries:
+                    raise SegmentedDownloadError(f'Segment {start}-{end} failed after {attempt} attempts: {e}')
+                time.sleep(0.5 * attempt)
+
+    def _close_all(self):
+        with self._lock:
+            for resource in self._open_resources:
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+            self._open_resources = []
+
+    def download(self, path):
+        """
+        Downloads the resource into path using parallel connections
+        Returns the number of bytes written; removes the partial file on failure
+        """
+        try:
+            total_size = self.probe_size()
+            self._drop_connection()  # The probe ran on the caller's thread, not a worker
+
+            # Preallocate the whole file so segments can be written in any order
+            with open(path, 'wb') as f:
+                f.truncate(total_size)
+
+            segments = [(start, min(start + self.segment_size, total_size) - 1)
+                        for start in range(0, total_size, self.segment_size)]
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.connections) as pool:
+                futures = [pool.submit(self._fetch_segment, path, start, end) for start, end in segments]
+                try:
+                    for future in concurrent.futures.as_completed(futures):
+                        future.result()
+                except Exception:
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+            return total_size
+        except Exception:
+            self._close_all()
+            if os.path.exists(path):
+                os.remove(path)
+            raise
+        finally:
+            self._close_all()
+
+
+def prepare_segmented_download(url, output_folder, duration=None):
+    """
+    Pre-fetches the audio stream of a long track with SegmentedDownloader
+    Returns (info_path, stream_path): an info JSON that yt-dlp can continue
+    from with --load-info-json and the pre-fetched file, or (None, None) if
+    the track should take the normal path
+    """
+    # A known short duration (e.g. from the playlist listing) skips the extra extraction
+    if not SEGMENTED_DOWNLOAD or (duration and duration < SEGMENTED_MIN_DURATION):
+        return None, None
+
+    try:
+        result = subprocess.run(
+            [
+                sys.executable, '-m', 'yt_dlp',
+                '--dump-json',
+                '-f', 'bestaudio/best',  # Same format -x selects, so yt-dlp finds the file
+                '-o', '%(title)s.%(ext)s',
+                '--no-warnings',
+                '--no-playlist',
+                url
+            ],
+            cwd=output_folder,
+            capture_output=True,
+            text=True,
+            timeout=60,
+            encoding='utf-8',
+            errors='replace'
+        )
+        if result.returncode != 0 or not result.stdout.strip():
+            return None, None
+
+        info = json.loads(result.stdout.strip().split('\n')[-1])
+
+        # Short tracks and fragmented (HLS/DASH) streams keep using yt-dlp directly
+        if (info.get('duration') or 0) < SEGMENTED_MIN_DURATION:
+            return None, None
+        if info.get('protocol') not in ('http', 'https') or not info.get('url'):
+            return None, None
+
+        filename = os.path.join(output_folder, info.get('_filename') or info['filename'])
+        start_time = time.time()
+        size = SegmentedDownloader(info['url'], headers=info.get('http_headers')).download(filename)
+        app.logger.info(f"Segmented download of {info.get('title')}: "
+                        f"{size / (1024 * 1024):.1f} MB in {time.time() - start_time:.1f}s")
+
+        info_path = os.path.join(output_folder, f"{info['id']}.info.json")
+        with open(info_path, 'w', encoding='utf-8') as f:
+            json.dump(info, f)
+        return info_path, filename
+    except Exception as e:
+        app.logger.error(f"Segmented download failed for {url}, falling back to yt-dlp: {e}")
+        return None, None
+
+
+# ========================================
+# Download Engine
+# ========================================
+
+def download_single_item(video_info, output_folder, audio_quality, job_log, timeout=600):
+    """
+    Downloads one video as MP3 into output_folder, safely (never raises)
+    Shared by the single and batch endpoints and the command line entry point
+    """
+    try:
+        url = video_info.get('url', '')
+        title = video_info.get('title', 'video')
+        
+        ffmpeg_path = os.path.join(FFMPEG_DIR, 'ffmpeg.exe') if os.path.exists(FFMPEG_DIR) else 'ffmpeg'
+        
+        # Long tracks may already be fetched over parallel connections
+        info_path, stream_path = prepare_segmented_download(url, output_folder, video_info.get('duration'))
+        
+        cmd = [
+            sys.executable, '-m', 'yt_dlp',
+            '--no-check-certificates',
+            '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            '-x',
+            '--audio-format', 'mp3',
+            '--audio-quality', f'{audio_quality}K',
+            '--embed-thumbnail',  # Embed thumbnail
+            '--add-metadata',     # Add metadata
+            '-o', '%(title)s.%(ext)s',
+            '--ffmpeg-location', ffmpeg_path,
+            '--no-warnings',
+            '--ignore-errors',
+            '--no-playlist', 
+        ]
+        # yt-dlp finds the pre-fetched file and only runs the conversion
+        cmd += ['--load-info-json', info_path] if info_path else [url]
+        
+        # Use subprocess to run yt-dlp, streaming its output into the job log
+        # We don't use a lock here because we want parallelism
+        returncode = None
+        try:
+            returncode = run_logged(
+                cmd,
+                output_folder,
+                job_log,
+                timeout=timeout, # 10 mins per song max by default
+                source=title
+            )
+        finally:
+            if info_path and os.path.exists(info_path):
+                os.remove(info_path)
+            # An unconverted stream would otherwise be counted as a finished track
+            if returncode != 0 and stream_path and os.path.exists(stream_path):
+                os.remove(stream_path)
+        
+        if returncode == 0:
+            print(f"[OK] Downloaded: {title}", file=sys.stderr)
+            return True
+        else:
+            print(f"[ERROR] Failed {title}: {job_log.last_error(title) or f'exit code {returncode}'}", file=sys.stderr)
+            return False
+            
+    except Exception as e:
+        print(f"[ERROR] Exception {url}: {e}", file=sys.stderr)
+        return False
+
+
+def download_batch(videos, output_folder, audio_quality, job_log, on_progress=None, pool=None):
+    """
+    Downloads a list of videos in parallel on pool (the shared executor by default)
+    on_progress(done, total, video, ok, seconds) is called as each one finishes
+    Returns the number of videos downloaded successfully
+    """
+    pool = pool or executor
+    
+    def timed_download(video):
+        start_time = time.time()
+        ok = download_single_item(video, output_folder, audio_quality, job_log)
+        return ok, time.time() - start_time
+    
+    # Submit all tasks to the pool
+    futures = {pool.submit(timed_download, video): video for video in videos}
+    
+    # Wait for completion and report progress
+    completed_count = 0
+    for i, future in enumerate(concurrent.futures.as_completed(futures)):
+        ok, seconds = False, 0.0
+        try:
+            ok, seconds = future.result()
+        except Exception as e:
+            print(f"Task exception: {e}", file=sys.stderr)
+        if ok:
+            completed_count += 1
+        if on_progress:
+            on_progress(i + 1, len(videos), futures[future], ok, seconds)
+    return completed_count
+
+
+# ========================================
+# Static Assets
+# ========================================
+
+def write_static_file(path, content):
+    """
+    Writes a build file through a temporary name and os.replace, so other
+    processes serving the same build folder never see a missing or partial file
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def write_compressed_variants(path, content):
+    """
+    Writes gzip and brotli siblings (.gz, .br) next to path
+    Returns the list of encodings that were written
+    """
+    encodings = []
+    write_static_file(path + '.gz', gzip.compress(content, compresslevel=9, mtime=0))
+    encodings.append('gzip')
+    if brotli is not None:
+        write_static_file(path + '.br', brotli.compress(content, quality=11))
+        encodings.append('br')
+    return encodings
+
+
+def build_static_assets():
+    """
+    Build step for the frontend: writes content-hashed copies of the static
+    assets with precompressed variants, plus an index.html that points at them
+    Returns the manifest mapping original names to their built files
+    """
+    # The folder is never cleared: several worker processes may build and serve
+    # it at once, and a hashed name always maps to the same content
+    os.makedirs(STATIC_BUILD_DIR, exist_ok=True)
+
+    manifest = {}
+    for name in STATIC_ASSETS:
+        with open(os.path.join(SCRIPT_DIR, name), 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        base, ext = os.path.splitext(name)
+        hashed_name = f"{base}.{digest}{ext}"
+        hashed_path = os.path.join(STATIC_BUILD_DIR, hashed_name)
+        write_static_file(hashed_path, content)
+        manifest[name] = {
+            'file': hashed_name,
+            'hash': digest,
+            'encodings': write_compressed_variants(hashed_path, content)
+        }
+
+    # Point index.html at the hashed names (replaces the old ?v=N cache busting)
+    with open(os.path.join(SCRIPT_DIR, 'index.html'), 'r', encoding='utf-8') as f:
+        html = f.read()
+    for name, entry in manifest.items():
+        html = re.sub(
+            rf'(["\']){re.escape(name)}(\?[^"\']*)?\1',
+            lambda m, entry=entry: f"{m.group(1)}/assets/{entry['file']}{m.group(1)}",
+            html
+        )
+    content = html.encode('utf-8')
+    index_path = os.path.join(STATIC_BUILD_DIR, 'index.html')
+    write_static_file(index_path, content)
+    manifest['index.html'] = {
+        'file': 'index.html',
+        'hash': hashlib.sha256(content).hexdigest()[:12],
+        'encodings': write_compressed_variants(index_path, content)
+    }
+
+    return manifest
+
+
+def get_static_manifest():
+    """Returns the static asset manifest, building the assets on first use"""
+    global static_manifest
+    with static_manifest_lock:
+        if static_manifest is None:
+            static_manifest = build_static_assets()
+        return static_manifest
+
+
+def send_precompressed(entry, immutable):
+    """
+    Sends a built asset using the best precompressed variant the client accepts
+    Strong ETags include the encoding, since each variant has different bytes
+    """
+    path = os.path.join(STATIC_BUILD_DIR, entry['file'])
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if candidate in entry['encodings'] and request.accept_encodings[candidate]:
+            encoding = candidate
+            path += suffix
+            break
+
+    # Without max_age the response is no-cache: the page itself is always
+    # revalidated so new asset hashes are picked up
+    response = send_file(
+        path,
+        mimetype=mimetypes.guess_type(entry['file'])[0],
+        download_name=entry['file'],
+        etag=f"{entry['hash']}-{encoding or 'identity'}",
+        conditional=True,
+        max_age=STATIC_MAX_AGE if immutable else None
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if immutable:
+        response.cache_control.immutable = True
+    return response
+
+
+# ========================================
+# Thumbnail Proxy
+# ========================================
+
+def fetch_youtube_thumbnail(video_id):
+    """Downloads the original thumbnail from YouTube; returns JPEG bytes or None"""
+    try:
+        with urllib.request.urlopen(f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg", timeout=10) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 404:
+            return None
+        raise
+
+
+# Upstream fetcher, replaceable (e.g. with a local stub in tests)
+thumbnail_fetcher = fetch_youtube_thumbnail
+
+
+def write_thumb_cache(path, content):
+    """Stores a file in the thumbnail cache, evicting the oldest files if it grows too large"""
+    global thumb_cache_size
+    os.makedirs(THUMB_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)  # Readers never see a partial file
+
+    with thumb_cache_lock:
+        if thumb_cache_size is not None:
+            thumb_cache_size += len(content)
+        if thumb_cache_size is not None and thumb_cache_size <= THUMB_CACHE_MAX_BYTES:
+            return
+
+        # Scan the folder (also on first write) and drop least recently used files
+        entries = []
+        for name in os.listdir(THUMB_CACHE_DIR):
+            try:
+                stat = os.stat(os.path.join(THUMB_CACHE_DIR, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+            except OSError:
+                continue
+        thumb_cache_size = sum(size for _, size, _ in entries)
+        entries.sort()
+        target = THUMB_CACHE_MAX_BYTES * 0.9
+        for _, size, name in entries:
+            if thumb_cache_size <= target:
+                break
+            try:
+                os.remove(os.path.join(THUMB_CACHE_DIR, name))
+                thumb_cache_size -= size
+            except OSError:
+                continue
+
+
+def read_thumb_cache(path):
+    """Returns a cached file's bytes (marking it as recently used) or None"""
+    try:
+        with open(path, 'rb') as f:
+            content = f.read()
+        os.utime(path)
+        return content
+    except OSError:
+        return None
+
+
+def get_original_thumbnail(video_id):
+    """Returns the original thumbnail bytes, fetching from upstream only once per video"""
+    path = os.path.join(THUMB_CACHE_DIR, f"{video_id}.jpg")
+    content = read_thumb_cache(path)
+    if content is not None:
+        return content
+
+    with thumb_cache_lock:
+        lock = thumb_fetch_locks.setdefault(video_id, threading.Lock())
+    try:
+        with lock:
+            # Another request may have fetched it while we waited
+            content = read_thumb_cache(path)
+            if content is None:
+                content = thumbnail_fetcher(video_id)
+                if content:
+                    write_thumb_cache(path, content)
+            return content
+    finally:
+        with thumb_cache_lock:
+            thumb_fetch_locks.pop(video_id, None)
+
+
+def fetch_sprite_tile(video_id):
+    """
+    Returns (bytes or None, failed) for one sprite tile without raising
+    failed is True for temporary upstream errors (as opposed to a missing video)
+    """
+    try:
+        return get_original_thumbnail(video_id), False
+    except Exception as e:
+        app.logger.error(f"Thumbnail error for {video_id}: {e}")
+        return None, True
+
+
+def encode_image(image, image_format):
+    """Encodes a Pillow image as WebP or JPEG bytes"""
+    buffer = io.BytesIO()
+    if image_format == 'webp':
+        image.save(buffer, 'WEBP', quality=80, method=4)
+    else:
+        image.convert('RGB').save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def get_thumbnail_variant(video_id, width, image_format):
+    """Returns (bytes, format) for a resized thumbnail, caching each variant on disk"""
+    original = get_original_thumbnail(video_id)
+    if original is None or Image is None:
+        return original, 'jpeg'
+    if width == THUMB_WIDTHS[-1] and image_format == 'jpeg':
+        return original, 'jpeg'
+
+    path = os.path.join(THUMB_CACHE_DIR, f"{video_id}_{width}.{image_format}")
+    content = read_thumb_cache(path)
+    if content is None:
+        with Image.open(io.BytesIO(original)) as image:
+            height = max(1, round(image.height * width / image.width))
+            content = encode_image(image.resize((width, height), Image.LANCZOS), image_format)
+        write_thumb_cache(path, content)
+    return content, image_format
+
+
+def parse_thumb_options():
+    """Reads ?w= and ?format= (falling back to the Accept header) from the request"""
+    requested = request.args.get('w', type=int) or THUMB_WIDTHS[-1]
+    # Snap to the nearest allowed width so the number of cached variants stays bounded
+    width = next((w for w in THUMB_WIDTHS if w >= requested), THUMB_WIDTHS[-1])
+    image_format = request.args.get('format')
+    if image_format not in ('webp', 'jpeg'):
+        # Only an explicit image/webp counts: image/* or */* also come from
+        # browsers that cannot decode WebP (e.g. older Safari)
+        accepts_webp = any(mimetype == 'image/webp' and quality > 0
+                           for mimetype, quality in request.accept_mimetypes)
+        image_format = 'webp' if accepts_webp else 'jpeg'
+    return width, image_format
+
+
+def send_thumbnail(content, image_format, etag, cacheable=True):
+    """Sends image bytes with long-lived caching headers (no-cache if not cacheable)"""
+    response = send_file(
+        io.BytesIO(content),
+        mimetype=f'image/{image_format}',
+        etag=etag,
+        conditional=True,
+        max_age=THUMB_MAX_AGE if cacheable else None
+    )
+    response.vary.add('Accept')
+    return response
+
+
+def is_valid_video_id(video_id):
+    return re.fullmatch(r'[a-zA-Z0-9_-]{11}', video_id) is not None
+
+
+# ========================================
+# File Delivery
+# ========================================
+
+def content_disposition(download_name):
+    """Builds an attachment Content-Disposition header, with an RFC 5987 name for non-ASCII titles"""
+    try:
+        download_name.encode('ascii')
+        return f'attachment; filename="{download_name}"'
+    except UnicodeEncodeError:
+        simple_name = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+        quoted_name = urllib.parse.quote(download_name, safe="!#$&+^`|")
+        return f"attachment; filename=\"{simple_name}\"; filename*=UTF-8''{quoted_name}"
+
+
+def deliver_file(file_path, mimetype, download_name, on_complete):
+    """
+    Sends a finished download according to DELIVERY_MODE
+    In the proxy modes only headers are returned and the front proxy streams
+    the file, so no Python thread is held for the transfer; on_complete then
+    runs after DELIVERY_CLEANUP_DELAY instead of when the response closes
+    """
+    if DELIVERY_MODE not in ('x-accel-redirect', 'x-sendfile'):
+        # Passing the path keeps Range requests, ETag and Last-Modified working
+        response = send_file(
+            file_path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name
+        )
+        if request.method == 'GET' and response.status_code == 200:
+            call_after_body(response, on_complete)
+        else:
+            # HEAD, partial (206) and not-modified (304) responses don't carry
+            # the whole file, so the client is expected to come back for it
+            schedule_delivery_cleanup(file_path, on_complete)
+        return response
+
+    response = Response(status=200, mimetype=mimetype)
+    response.headers['Content-Disposition'] = content_disposition(download_name)
+    if DELIVERY_MODE == 'x-accel-redirect':
+        # nginx decodes the percent-encoded path, so any title works as is
+        relative_path = os.path.relpath(file_path, TEMP_DIR).replace(os.sep, '/')
+        response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + urllib.parse.quote(relative_path)
+    else:
+        response.headers['X-Sendfile'] = os.path.abspath(sendfile_path(file_path))
+
+    # The proxy reads the file after this response is done, so clean up later
+    schedule_delivery_cleanup(file_path, on_complete)
+    return response
+
+
+def call_after_body(response, callback):
+    """
+    Runs callback once the WSGI server closes the response body
+    send_file responses are passed through as is, so call_on_close never runs;
+    instead the close of the body object is extended in place, which keeps it
+    the server's own file_wrapper (and so still eligible for os.sendfile)
+    """
+    body = response.response
+    close_body = body.close
+
+    def close_then_callback():
+        try:
+            close_body()
+        finally:
+            callback()
+
+    body.close = close_then_callback
+
+
+def schedule_delivery_cleanup(file_path, on_complete):
+    """Runs on_complete after DELIVERY_CLEANUP_DELAY, once per job folder even if requested again"""
+    job_folder = os.path.dirname(os.path.abspath(file_path))
+    with delivery_cleanup_lock:
+        if job_folder in pending_delivery_cleanups:
+            return
+        pending_delivery_cleanups.add(job_folder)
+
+    def delayed_cleanup():
+        with delivery_cleanup_lock:
+            pending_delivery_cleanups.discard(job_folder)
+        on_complete()
+
+    timer = threading.Timer(DELIVERY_CLEANUP_DELAY, delayed_cleanup)
+    timer.daemon = True
+    timer.start()
+
+
+def sendfile_path(file_path):
+    """
+    Returns an ASCII-only path to file_path for the X-Sendfile header
+    Titles can contain any character, so a hard link (or symlink) with a
+    plain name is created next to the file, which itself is left untouched;
+    the link has no audio extension so it is never listed as a second track
+    """
+    if re.fullmatch(r'[\w.-]+', os.path.basename(file_path), re.ASCII):
+        return file_path
+
+    link_path = os.path.join(os.path.dirname(file_path), 'delivery.sendfile')
+    if not os.path.exists(link_path):
+        try:
+            os.link(file_path, link_path)
+        except OSError:
+            os.symlink(file_path, link_path)
+    return link_path
+
+
 # ========================================
 # API Routes
 # ========================================
@@ -159,7 +1111,31 @@ def get_playlist_count(url):
 @app.route('/')
 def index():
     """Serve the frontend"""
-    return send_file('index.html')
+    try:
+        manifest = get_static_manifest()
+    except OSError as e:
+        app.logger.error(f"Error building static assets: {e}")
+        return send_file('index.html')
+    return send_precompressed(manifest['index.html'], immutable=False)
+
+
+@app.route('/assets/<filename>')
+def get_asset(filename):
+    """Serve a content-hashed static asset"""
+    try:
+        manifest = get_static_manifest()
+    except OSError as e:
+        app.logger.error(f"Error building static assets: {e}")
+        # Fall back to the original file (app.<hash>.js -> app.js), uncompressed
+        original = re.sub(r'\.[0-9a-f]{12}(\.\w+)$', r'\1', filename)
+        if original in STATIC_ASSETS:
+            return send_file(os.path.join(SCRIPT_DIR, original))
+        return jsonify({'error': 'Archivo no encontrado'}), 404
+
+    for name, entry in manifest.items():
+        if name != 'index.html' and entry['file'] == filename:
+            return send_precompressed(entry, immutable=True)
+    return jsonify({'error': 'Archivo no encontrado'}), 404
 
 
 @app.route('/api/health', methods=['GET'])
@@ -206,24 +1182,7 @@ def search_youtube():
             return jsonify({'error': 'Error al buscar en YouTube'}), 500
         
         # Parse JSON output (one JSON object per line)
-        results = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                try:
-                    video = json.loads(line)
-                    # Extract relevant info
-                    video_id = video.get('id', '')
-                    if video_id:
-                        results.append({
-                            'id': video_id,
-                            'title': video.get('title', 'Sin título'),
-                            'thumbnail': f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg",
-                            'duration': video.get('duration', 0),
-                            'channel': video.get('channel', video.get('uploader', 'Canal desconocido')),
-                            'url': f"https://www.youtube.com/watch?v={video_id}"
-                        })
-                except json.JSONDecodeError:
-                    continue
+        results = parse_video_entries(result.stdout)
         
         if not results:
             return jsonify({'error': 'No se encontraron resultados'}), 404
@@ -264,45 +1223,12 @@ def get_playlist_info():
     
     try:
         # Use yt-dlp to get playlist info
-        result = subprocess.run(
-            [
-                sys.executable, '-m', 'yt_dlp',
-                playlist_url,
-                '--dump-json',
-                '--flat-playlist',
-                '--no-warnings',
-                '--no-download',
-            ],
-            capture_output=True,
-            text=True,
-            timeout=60,
-            encoding='utf-8',
-            errors='replace'
-        )
-        
-        if result.returncode != 0:
-            app.logger.error(f"yt-dlp playlist error: {result.stderr}")
+        try:
+            videos = get_playlist_videos(playlist_url)
+        except RuntimeError as e:
+            app.logger.error(f"yt-dlp playlist error: {e}")
             return jsonify({'error': 'Error al obtener información de la playlist'}), 500
         
-        # Parse JSON output (one JSON object per line)
-        videos = []
-        for line in result.stdout.strip().split('\n'):
-            if line:
-                try:
-                    video = json.loads(line)
-                    video_id = video.get('id', '')
-                    if video_id:
-                        videos.append({
-                            'id': video_id,
-                            'title': video.get('title', 'Sin título'),
-                            'thumbnail': f"https://i.ytimg.com/vi/{video_id}/mqdefault.jpg",
-                            'duration': video.get('duration', 0),
-                            'channel': video.get('channel', video.get('uploader', 'Canal desconocido')),
-                            'url': f"https://www.youtube.com/watch?v={video_id}"
-                        })
-                except json.JSONDecodeError:
-                    continue
-        
         if not videos:
             return jsonify({'error': 'No se encontraron videos en la playlist'}), 404
         
@@ -318,6 +1244,72 @@ def get_playlist_info():
         return jsonify({'error': f'Error: {str(e)}'}), 500
 
 
+@app.route('/api/thumb/<video_id>')
+def get_thumbnail(video_id):
+    """Serve a cached (and optionally resized) video thumbnail"""
+    if not is_valid_video_id(video_id):
+        return jsonify({'error': 'ID de video no válido'}), 400
+
+    width, image_format = parse_thumb_options()
+    try:
+        content, image_format = get_thumbnail_variant(video_id, width, image_format)
+    except Exception as e:
+        app.logger.error(f"Thumbnail error for {video_id}: {e}")
+        return jsonify({'error': 'Error al obtener la miniatura'}), 502
+
+    if content is None:
+        return jsonify({'error': 'Miniatura no encontrada'}), 404
+    return send_thumbnail(content, image_format, f"{video_id}-{width}-{image_format}")
+
+
+@app.route('/api/thumb-sprite')
+def get_thumbnail_sprite():
+    """
+    Serve several thumbnails combined into one sprite image (for playlist views)
+    Tiles are laid out in rows of SPRITE_COLUMNS, in the order of ?ids=
+    """
+    if Image is None:
+        return jsonify({'error': 'Sprites no disponibles (falta Pillow)'}), 501
+
+    video_ids = [v for v in request.args.get('ids', '').split(',') if v]
+    if not video_ids or len(video_ids) > SPRITE_MAX_IDS or not all(map(is_valid_video_id, video_ids)):
+        return jsonify({'error': f'Se requieren entre 1 y {SPRITE_MAX_IDS} IDs de video válidos'}), 400
+
+    width, image_format = parse_thumb_options()
+    height = width * 9 // 16  # YouTube thumbnails are 16:9
+    columns = min(SPRITE_COLUMNS, len(video_ids))
+    rows = (len(video_ids) + columns - 1) // columns
+
+    sprite_key = hashlib.sha256(f"{','.join(video_ids)}-{width}".encode()).hexdigest()[:16]
+    path = os.path.join(THUMB_CACHE_DIR, f"sprite_{sprite_key}.{image_format}")
+    content = read_thumb_cache(path)
+    cacheable = True
+    if content is None:
+        # Fetch the originals in parallel; missing or failing ones become blank tiles
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            tiles = list(pool.map(fetch_sprite_tile, video_ids))
+        originals = [original for original, _ in tiles]
+        # A blank tile from a temporary error must not be kept on disk or in browsers
+        cacheable = not any(failed for _, failed in tiles)
+
+        sprite = Image.new('RGB', (columns * width, rows * height), (24, 24, 24))
+        for index, original in enumerate(originals):
+            if not original:
+                continue
+            with Image.open(io.BytesIO(original)) as image:
+                tile = image.convert('RGB').resize((width, height), Image.LANCZOS)
+            sprite.paste(tile, ((index % columns) * width, (index // columns) * height))
+        content = encode_image(sprite, image_format)
+        if cacheable:
+            write_thumb_cache(path, content)
+
+    response = send_thumbnail(content, image_format, f"sprite-{sprite_key}-{image_format}", cacheable)
+    response.headers['X-Sprite-Tile'] = f"{width}x{height}"
+    response.headers['X-Sprite-Columns'] = str(columns)
+    response.headers['Access-Control-Expose-Headers'] = 'X-Sprite-Tile, X-Sprite-Columns'
+    return response
+
+
 @app.route('/api/progress/<download_id>')
 def get_progress(download_id):
     """Get current download progress"""
@@ -329,6 +1321,18 @@ def get_progress(download_id):
     return jsonify({'status': 'unknown', 'message': 'Download not found'}), 404
 
 
+@app.route('/api/logs/<download_id>')
+def get_logs(download_id):
+    """Get the last lines of yt-dlp output and any errors for a download"""
+    job_log = download_logs.get(download_id)
+    if job_log is None:
+        return jsonify({'error': 'Download not found'}), 404
+    count = request.args.get('lines', type=int)
+    if count is not None and count < 1:
+        return jsonify({'error': 'lines debe ser al menos 1'}), 400
+    return jsonify({'download_id': download_id, **job_log.tail(count)})
+
+
 @app.route('/api/start-batch-download', methods=['POST'])
 def start_batch_download():
     """Start batch download for multiple videos from a playlist in parallel"""
@@ -357,83 +1361,20 @@ def start_batch_download():
         'total': total_count,
         'message': f'Iniciando descarga paralela de {total_count} canciones...'
     }
+    job_log = register_job_log(download_id)
     
-    def download_single_item(video_info, output_folder, audio_quality):
-        """Helper to download one item safely"""
-        try:
-            url = video_info.get('url', '')
-            title = video_info.get('title', 'video')
-            
-            ffmpeg_path = os.path.join(FFMPEG_DIR, 'ffmpeg.exe') if os.path.exists(FFMPEG_DIR) else 'ffmpeg'
-            
-            cmd = [
-                sys.executable, '-m', 'yt_dlp',
-                '--no-check-certificates',
-                '--user-agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-                '-x',
-                '--audio-format', 'mp3',
-                '--audio-quality', f'{audio_quality}K',
-                '--embed-thumbnail',  # Embed thumbnail
-                '--add-metadata',     # Add metadata
-                '-o', '%(title)s.%(ext)s',
-                '--ffmpeg-location', ffmpeg_path,
-                '--no-warnings',
-                '--ignore-errors',
-                '--no-playlist', 
-                url
-            ]
-
-            
-            # Use subprocess to run yt-dlp
-            # We don't use a lock here because we want parallelism
-            proc = subprocess.run(
-                cmd,
-                cwd=output_folder,
-                capture_output=True,
-                timeout=600, # 10 mins per song max
-                encoding='utf-8',
-                errors='replace'
-            )
-            
-            if proc.returncode == 0:
-                print(f"[OK] Downloaded: {title}")
-                return True
-            else:
-                print(f"[ERROR] Failed {title}: {proc.stderr}")
-                return False
-                
-        except Exception as e:
-            print(f"[ERROR] Exception {url}: {e}")
-            return False
-
     def run_parallel_batch():
+        def update_progress(current_done, total, video, ok, seconds):
+            percent = int((current_done / total) * 100)
+            download_progress[download_id] = {
+                'status': 'downloading',
+                'current': current_done,
+                'total': total,
+                'message': f'Procesando: {current_done}/{total} completados ({percent}%)'
+            }
+        
         try:
-            completed_count = 0
-            
-            # Submit all tasks to the executor
-            futures = []
-            for video in videos:
-                futures.append(executor.submit(download_single_item, video, download_folder, quality))
-                
-            # Wait for completion and update progress
-            for i, future in enumerate(concurrent.futures.as_completed(futures)):
-                try:
-                    result = future.result()
-                    if result:
-                        completed_count += 1
-                except Exception as e:
-                    print(f"Task exception: {e}")
-                
-                # Update progress
-                current_done = i + 1
-                percent = int((current_done / total_count) * 100)
-                
-                download_progress[download_id] = {
-                    'status': 'downloading',
-                    'current': current_done,
-                    'total': total_count,
-                    'message': f'Procesando: {current_done}/{total_count} completados ({percent}%)'
-                }
+            download_batch(videos, download_folder, quality, job_log, update_progress)
                 
             # Final check
             final_files_count = count_downloaded_files(download_folder)
@@ -466,6 +1407,8 @@ def start_batch_download():
                 'total': total_count,
                 'message': f'Error fatal: {str(e)}'
             }
+        finally:
+            job_log.finish()
     
     # Run the coordination flow in a separate thread
     # This thread just manages futures, doesn't do heavy lifting
@@ -533,6 +1476,7 @@ def start_download():
         'total': total_count,
         'message': 'Iniciando descarga...'
     }
+    job_log = register_job_log(download_id)
     
     # Start download in background thread
     def run_download():
@@ -581,41 +1525,23 @@ def start_download():
             monitor_thread = threading.Thread(target=monitor_files, daemon=True)
             monitor_thread.start()
             
-            # Create a batch file with the command to avoid shell escaping issues
-            batch_file = os.path.join(download_folder, 'download.bat')
-            log_file = os.path.join(download_folder, 'ytdlp_log.txt')
-            
-            # Build the command line for the batch file
-            cmd_line = ' '.join(f'"{c}"' if ' ' in c or '&' in c or '?' in c or '=' in c or '%' in c else c for c in cmd)
-            
-            # Escape % as %% for Windows batch files (otherwise %(title)s becomes (title)s)
-            cmd_line = cmd_line.replace('%', '%%')
-            
-            # Write batch file
-            with open(batch_file, 'w', encoding='utf-8') as f:
-                f.write('@echo off\n')
-                f.write(f'{cmd_line} > "{log_file}" 2>&1\n')
-            
-            app.logger.info(f"Running batch file: {batch_file}")
-            
-            # Run the batch file
-            result = subprocess.run(
-                [batch_file],
-                shell=True,
-                cwd=download_folder,
-            )
-            
-            # Log the output for debugging
-            if os.path.exists(log_file):
-                with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
-                    log_content = f.read()
-                    app.logger.info(f"yt-dlp output: {log_content[:1000]}")
+            if content_type in ('video', 'shorts', 'music'):
+                # Single videos take the shared per-track path, which pre-fetches
+                # long tracks (mixes, podcasts) with the segmented downloader;
+                # no time limit, as the whole job had none before
+                ok = download_single_item({'url': search_query, 'title': content_id},
+                                          download_folder, quality, job_log, timeout=None)
+                returncode = 0 if ok else 1
+            else:
+                # Run yt-dlp without a shell (no escaping issues) and stream its
+                # output into the job log instead of a log file
+                returncode = run_logged(cmd, download_folder, job_log)
             
             # Stop the monitor thread FIRST and wait for it to fully stop
             stop_monitor.set()
             monitor_thread.join(timeout=5)  # Wait up to 5 seconds
             
-            app.logger.info(f"yt-dlp finished with code {result.returncode}")
+            app.logger.info(f"yt-dlp finished with code {returncode}")
             
             # Wait for file system to sync
             time.sleep(1)
@@ -637,7 +1563,8 @@ def start_download():
                 # Log what files exist
                 all_files = os.listdir(download_folder) if os.path.exists(download_folder) else []
                 app.logger.error(f"No audio files. Files in folder: {all_files}")
-                app.logger.error(f"yt-dlp return code: {result.returncode}")
+                app.logger.error(f"yt-dlp return code: {returncode}")
+                app.logger.error(f"yt-dlp last error: {job_log.last_error()}")
                 download_progress[download_id] = {
                     'status': 'error',
                     'current': 0,
@@ -655,6 +1582,8 @@ def start_download():
                 'total': total_count,
                 'message': f'Error: {str(e)}'
             }
+        finally:
+            job_log.finish()
     
     # Submit to global thread pool instead of spawning unlimited threads
     executor.submit(run_download)
@@ -682,60 +1611,53 @@ def get_download(download_id):
     
     if not downloaded_files:
         cleanup_temp_folder(download_folder)
+        download_logs.pop(download_id, None)
         return jsonify({'error': 'No hay archivos para descargar'}), 404
     
+    def cleanup():
+        cleanup_temp_folder(download_folder)
+        if download_id in download_progress:
+            del download_progress[download_id]
+        download_logs.pop(download_id, None)
+    
     # If only one file, send it directly
     if len(downloaded_files) == 1:
         file_path = os.path.join(download_folder, downloaded_files[0])
         app.logger.info(f"Sending single file: {file_path}")
-        response = send_file(
-            file_path,
-            mimetype='audio/mpeg',
-            as_attachment=True,
-            download_name=downloaded_files[0]
-        )
-        
-        @response.call_on_close
-        def cleanup():
-            cleanup_temp_folder(download_folder)
-            if download_id in download_progress:
-                del download_progress[download_id]
-        
-        return response
+        return deliver_file(file_path, 'audio/mpeg', downloaded_files[0], cleanup)
     
-    # Multiple files - create ZIP
-    app.logger.info(f"Creating ZIP for {len(downloaded_files)} files...")
+    # Multiple files - build the ZIP once per job and reuse it on later requests
+    zip_path = os.path.join(download_folder, DELIVERY_ZIP_NAME)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     zip_name = f"youtube_playlist_{timestamp}"
     
-    try:
-        zip_path = create_zip_from_folder(download_folder, zip_name)
-        app.logger.info(f"ZIP created at: {zip_path}")
-    except Exception as e:
-        app.logger.error(f"Error creating ZIP: {e}")
-        cleanup_temp_folder(download_folder)
-        return jsonify({'error': f'Error al crear ZIP: {str(e)}'}), 500
+    if os.path.exists(zip_path):
+        app.logger.info(f"Reusing ZIP at: {zip_path}")
+    else:
+        app.logger.info(f"Creating ZIP for {len(downloaded_files)} files...")
+        try:
+            # Built under a unique name and moved into place, so a concurrent
+            # request never sends a half-written archive
+            tmp_zip_path = create_zip_from_folder(download_folder, f"playlist-{uuid.uuid4().hex}")
+            if tmp_zip_path:
+                os.replace(tmp_zip_path, zip_path)
+            app.logger.info(f"ZIP created at: {zip_path}")
+        except Exception as e:
+            app.logger.error(f"Error creating ZIP: {e}")
+            cleanup_temp_folder(download_folder)
+            download_logs.pop(download_id, None)
+            return jsonify({'error': f'Error al crear ZIP: {str(e)}'}), 500
     
-    if not zip_path or not os.path.exists(zip_path):
+    if not os.path.exists(zip_path):
         app.logger.error(f"ZIP file not found at {zip_path}")
         cleanup_temp_folder(download_folder)
+        download_logs.pop(download_id, None)
         return jsonify({'error': 'Error al crear el archivo ZIP'}), 500
     
     zip_size = os.path.getsize(zip_path) / (1024 * 1024)  # MB
     app.logger.info(f"Sending ZIP file ({zip_size:.2f} MB)...")
     
-    response = send_file(
-        zip_path,
-        mimetype='application/zip',
-        as_attachment=True,
-        download_name=f"{zip_name}.zip"
-    )
-    
-    @response.call_on_close
-    def cleanup():
-        cleanup_temp_folder(download_folder)
-        if download_id in download_progress:
-            del download_progress[download_id]
+    response = deliver_file(zip_path, 'application/zip', f"{zip_name}.zip", cleanup)
     
     app.logger.info(f"Response prepared, returning to client")
     return response
@@ -763,6 +1685,9 @@ if __name__ == '__main__':
     # Ensure temp directory exists
     os.makedirs(TEMP_DIR, exist_ok=True)
     
+    # Build hashed, precompressed frontend assets
+    get_static_manifest()
+    
     print("""
     ╔═══════════════════════════════════════════════════════════╗
     ║         YouTube Music Downloader - Backend Server         ║
@@ -0,0 +1,97 @@
+"""Tests for the command line batch entry point, with the download engine stubbed"""
+
+import json
+import os
+
+import pytest
+
+import cli
+import server
+
+
+PLAYLIST = [
+    {'url': 'https://www.youtube.com/watch?v=aaaaaaaaaaa', 'title': 'Song A'},
+    {'url': 'https://www.youtube.com/watch?v=bbbbbbbbbbb', 'title': 'Song B'},
+]
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    """Stubs yt-dlp: URLs containing 'bbb' fail with an error in the job log"""
+    calls = []
+
+    def fake_download(video_info, output_folder, audio_quality, job_log, timeout=600):
+        calls.append((video_info['url'], audio_quality))
+        if 'bbb' in video_info['url']:
+            job_log.append('ERROR: [youtube] bbbbbbbbbbb: Video unavailable', video_info['title'])
+            return False
+        open(os.path.join(output_folder, f"{video_info['title']}.mp3"), 'wb').close()
+        return True
+
+    monkeypatch.setattr(server, 'download_single_item', fake_download)
+    monkeypatch.setattr(server, 'get_playlist_videos', lambda url: list(PLAYLIST))
+    return calls
+
+
+def events(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_read_inputs_skips_comments_and_blank_lines(tmp_path):
+    url_file = tmp_path / 'urls.txt'
+    url_file.write_text('# nightly\n\nhttps://youtu.be/aaaaaaaaaaa\n   \n  https://youtu.be/ccccccccccc  \n')
+
+    assert cli.read_inputs(['first'], str(url_file)) == [
+        'first', 'https://youtu.be/aaaaaaaaaaa', 'https://youtu.be/ccccccccccc'
+    ]
+
+
+def test_resolve_videos(downloads, monkeypatch):
+    assert cli.resolve_videos('daft punk') == [{'url': 'ytsearch:daft punk', 'title': 'daft punk'}]
+    assert cli.resolve_videos('https://youtu.be/aaaaaaaaaaa') == [
+        {'url': 'https://youtu.be/aaaaaaaaaaa', 'title': 'aaaaaaaaaaa'}
+    ]
+    assert cli.resolve_videos('https://www.youtube.com/playlist?list=PLx') == PLAYLIST
+
+    with pytest.raises(ValueError, match='Mix'):
+        cli.resolve_videos('https://www.youtube.com/watch?v=aaaaaaaaaaa&list=RDaaaaaaaaaaa')
+    with pytest.raises(ValueError, match='valid'):
+        cli.resolve_videos('https://example.com/video')
+
+    monkeypatch.setattr(server, 'get_playlist_videos', lambda url: [])
+    with pytest.raises(ValueError, match='empty'):
+        cli.resolve_videos('https://www.youtube.com/playlist?list=PLx')
+
+
+def test_successful_run_writes_files_and_exits_zero(downloads, capsys, tmp_path):
+    code = cli.main(['https://youtu.be/aaaaaaaaaaa', '-q', '320', '-j', '2', '-o', str(tmp_path)])
+
+    stream = events(capsys)
+    assert code == 0
+    assert [e['event'] for e in stream] == ['start', 'track', 'summary']
+    assert stream[0]['jobs'] == 2 and stream[0]['quality'] == '320'
+    assert stream[1]['status'] == 'ok' and stream[1]['done'] == 1 and stream[1]['total'] == 1
+    assert stream[2]['ok'] == 1 and stream[2]['failed'] == 0
+    assert downloads == [('https://youtu.be/aaaaaaaaaaa', '320')]
+    assert os.listdir(tmp_path) == ['aaaaaaaaaaa.mp3']
+
+
+def test_failures_and_invalid_inputs_are_reported(downloads, capsys, tmp_path):
+    code = cli.main(['https://www.youtube.com/playlist?list=PLx', 'https://example.com/x', '-o', str(tmp_path)])
+
+    stream = events(capsys)
+    assert code == 1
+    assert stream[0] == {'event': 'invalid', 'input': 'https://example.com/x', 'error': 'Not a valid YouTube URL'}
+    tracks = {e['title']: e for e in stream if e['event'] == 'track'}
+    assert tracks['Song A']['status'] == 'ok'
+    assert tracks['Song B']['status'] == 'error'
+    assert tracks['Song B']['error'] == 'Video unavailable'
+    summary = stream[-1]
+    assert summary['event'] == 'summary'
+    assert (summary['tracks'], summary['ok'], summary['failed'], summary['invalid_inputs']) == (2, 1, 1, 1)
+
+
+def test_no_inputs_is_a_usage_error(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        cli.main([])
+    assert exit_info.value.code == 2
@@ -0,0 +1,126 @@
+"""Tests for finished-file delivery (Flask streaming and proxy offload modes)"""
+
+import io
+import os
+import threading
+import time
+import urllib.request
+
+import pytest
+from werkzeug.serving import make_server
+from werkzeug.wsgi import FileWrapper
+
+import server
+
+
+TITLE = 'Canción 中文.mp3'
+
+
+@pytest.fixture
+def job_folder(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'TEMP_DIR', str(tmp_path))
+    monkeypatch.setattr(server, 'pending_delivery_cleanups', set())
+    folder = tmp_path / 'job1'
+    folder.mkdir()
+    (folder / TITLE).write_bytes(b'x' * 100000)
+    return folder
+
+
+def test_flask_mode_keeps_file_wrapper_and_cleans_up(job_folder):
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{httpd.port}/api/download/job1') as response:
+            assert len(response.read()) == 100000
+            assert response.headers['Content-Length'] == '100000'
+        for _ in range(50):
+            if not job_folder.exists():
+                break
+            time.sleep(0.05)
+        assert not job_folder.exists()
+    finally:
+        httpd.shutdown()
+
+
+def test_flask_mode_passes_file_object_to_wrapper(job_folder):
+    with server.app.test_request_context():
+        response = server.deliver_file(str(job_folder / TITLE), 'audio/mpeg', TITLE, lambda: None)
+        # The server's file_wrapper gets the real file, so it can use os.sendfile
+        assert isinstance(response.response, FileWrapper)
+        assert isinstance(response.response.file, io.BufferedReader)
+        response.close()
+
+
+def test_flask_mode_head_keeps_files_for_the_download(job_folder, monkeypatch):
+    monkeypatch.setattr(server, 'DELIVERY_CLEANUP_DELAY', 60)
+    client = server.app.test_client()
+
+    head = client.head('/api/download/job1')
+    assert head.status_code == 200
+    assert head.headers['Content-Length'] == '100000'
+    head.close()
+    assert (job_folder / TITLE).exists()
+    assert server.pending_delivery_cleanups == {str(job_folder)}
+
+    response = client.get('/api/download/job1')
+    assert response.status_code == 200
+    assert len(response.data) == 100000
+    response.close()
+    assert not job_folder.exists()
+
+
+def test_flask_mode_serves_ranges_and_validators(job_folder, monkeypatch):
+    monkeypatch.setattr(server, 'DELIVERY_CLEANUP_DELAY', 60)
+    client = server.app.test_client()
+
+    response = client.get('/api/download/job1', headers={'Range': 'bytes=500-999'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == 'bytes 500-999/100000'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert len(response.data) == 500
+    assert response.headers['ETag'] and response.headers['Last-Modified']
+    response.close()
+
+    # A partial response doesn't finish the download
+    assert (job_folder / TITLE).exists()
+
+
+@pytest.mark.parametrize('mode', ['x-accel-redirect', 'x-sendfile'])
+def test_proxy_modes_keep_title_and_schedule_one_cleanup(job_folder, monkeypatch, mode):
+    monkeypatch.setattr(server, 'DELIVERY_MODE', mode)
+    monkeypatch.setattr(server, 'DELIVERY_CLEANUP_DELAY', 0.5)
+    client = server.app.test_client()
+
+    first = client.get('/api/download/job1')
+    second = client.get('/api/download/job1')
+
+    for response in (first, second):
+        assert response.status_code == 200
+        assert "filename*=UTF-8''Canci%C3%B3n" in response.headers['Content-Disposition']
+    assert (job_folder / TITLE).exists()
+    assert len(server.pending_delivery_cleanups) == 1
+    if mode == 'x-accel-redirect':
+        assert first.headers['X-Accel-Redirect'].startswith('/protected-downloads/job1/Canci%C3%B3n')
+    else:
+        assert os.path.samefile(first.headers['X-Sendfile'], job_folder / TITLE)
+
+    time.sleep(1)
+    assert not job_folder.exists()
+    assert not server.pending_delivery_cleanups
+
+
+def test_playlist_zip_is_built_once_and_reused(job_folder, monkeypatch):
+    monkeypatch.setattr(server, 'DELIVERY_MODE', 'x-accel-redirect')
+    monkeypatch.setattr(server, 'DELIVERY_CLEANUP_DELAY', 60)
+    (job_folder / 'Second.mp3').write_bytes(b'y' * 1000)
+    client = server.app.test_client()
+
+    first = client.get('/api/download/job1')
+    built_at = os.stat(job_folder / server.DELIVERY_ZIP_NAME).st_mtime_ns
+    time.sleep(0.05)
+    second = client.get('/api/download/job1')
+
+    assert first.headers['X-Accel-Redirect'] == second.headers['X-Accel-Redirect'] == '/protected-downloads/job1/playlist.zip'
+    assert os.stat(job_folder / server.DELIVERY_ZIP_NAME).st_mtime_ns == built_at
+    assert [name for name in os.listdir(job_folder) if name.endswith('.zip')] == [server.DELIVERY_ZIP_NAME]
+    assert second.headers['Content-Disposition'].startswith('attachment; filename="youtube_playlist_')
@@ -0,0 +1,71 @@
+"""Tests for the bounded per-job yt-dlp logs"""
+
+import os
+import sys
+
+import pytest
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def clean_logs(monkeypatch):
+    monkeypatch.setattr(server, 'download_logs', {})
+
+
+def test_run_logged_keeps_a_bounded_tail_and_errors():
+    job_log = server.JobLog(max_lines=10)
+    script = ('import sys\n'
+              'for i in range(5000): print("line", i)\n'
+              'print("ERROR: [youtube] dQw4w9WgXcQ: Video unavailable")\n'
+              'sys.exit(1)')
+
+    returncode = server.run_logged([sys.executable, '-c', script], None, job_log, source='song')
+
+    tail = job_log.tail()
+    assert returncode == 1
+    assert len(tail['lines']) == 10
+    assert tail['total_lines'] == 5001
+    assert tail['dropped_lines'] == 4991
+    assert tail['errors'][0]['video_id'] == 'dQw4w9WgXcQ'
+    assert job_log.last_error('song') == 'Video unavailable'
+
+
+def test_logs_endpoint_returns_tail():
+    server.register_job_log('job1').append('hello')
+    client = server.app.test_client()
+
+    assert client.get('/api/logs/job1?lines=5').get_json()['lines'] == ['hello']
+    assert client.get('/api/logs/missing').status_code == 404
+
+
+def test_logs_endpoint_rejects_non_positive_line_counts():
+    job_log = server.register_job_log('job1')
+    for i in range(5):
+        job_log.append(f'line {i}')
+    client = server.app.test_client()
+
+    assert client.get('/api/logs/job1?lines=-2').status_code == 400
+    assert client.get('/api/logs/job1?lines=0').status_code == 400
+    assert client.get('/api/logs/job1?lines=2').get_json()['lines'] == ['line 3', 'line 4']
+
+
+def test_finished_logs_expire_after_ttl(monkeypatch):
+    server.register_job_log('old').finish()
+    server.register_job_log('running')
+    server.download_logs['old'].finished_at -= server.LOG_TTL + 1
+
+    server.register_job_log('new')
+
+    assert set(server.download_logs) == {'running', 'new'}
+
+
+def test_download_without_files_drops_log(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'TEMP_DIR', str(tmp_path))
+    os.makedirs(tmp_path / 'job2')
+    server.register_job_log('job2')
+
+    response = server.app.test_client().get('/api/download/job2')
+
+    assert response.status_code == 404
+    assert 'job2' not in server.download_logs
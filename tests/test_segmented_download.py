@@ -0,0 +1,166 @@
+"""Tests for the segmented downloader against a local HTTP server stand-in"""
+
+import os
+import re
+import subprocess
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import server
+
+
+DATA = os.urandom(1_000_003)
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves DATA with byte ranges; behaviour is tweaked through server attributes"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_empty(self, status, headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        state = self.server.state
+        state['requests'] += 1
+        if self.path == '/redirect':
+            return self.send_empty(302, [('Location', '/file')])
+
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers.get('Range', ''))
+        if state['ignore_range'] or not match:
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(DATA)))
+            self.end_headers()
+            self.wfile.write(DATA)
+            return
+
+        start, end = int(match.group(1)), int(match.group(2))
+        if start > 0 and state['failures'] > 0:
+            state['failures'] -= 1
+            return self.send_empty(500)
+
+        body = DATA[start:end + 1]
+        self.send_response(206)
+        if not state['no_content_range']:
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(DATA)}')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def http_server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), RangeHandler)
+    httpd.state = {'requests': 0, 'failures': 0, 'ignore_range': False, 'no_content_range': False}
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def make_downloader(httpd, path='/redirect'):
+    return server.SegmentedDownloader(
+        f'http://127.0.0.1:{httpd.server_port}{path}',
+        connections=4,
+        segment_size=64 * 1024,
+        retries=3
+    )
+
+
+def test_download_follows_redirect_and_retries_segments(http_server, tmp_path):
+    http_server.state['failures'] = 2
+    target = tmp_path / 'out.bin'
+
+    size = make_downloader(http_server).download(str(target))
+
+    assert size == len(DATA)
+    assert target.read_bytes() == DATA
+    assert http_server.state['failures'] == 0
+
+
+def test_server_ignoring_range_is_rejected(http_server, tmp_path):
+    http_server.state['ignore_range'] = True
+    target = tmp_path / 'out.bin'
+
+    with pytest.raises(server.SegmentedDownloadError):
+        make_downloader(http_server, '/file').download(str(target))
+    assert not target.exists()
+
+
+def test_missing_content_range_is_rejected(http_server, tmp_path):
+    http_server.state['no_content_range'] = True
+    target = tmp_path / 'out.bin'
+
+    with pytest.raises(server.SegmentedDownloadError):
+        make_downloader(http_server, '/file').download(str(target))
+    assert not target.exists()
+
+
+def test_failed_download_removes_partial_file(http_server, tmp_path):
+    http_server.state['failures'] = 1000  # Every segment after the first keeps failing
+    target = tmp_path / 'out.bin'
+
+    with pytest.raises(server.SegmentedDownloadError):
+        make_downloader(http_server, '/file').download(str(target))
+    assert not target.exists()
+
+
+def test_known_short_duration_skips_extraction(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'SEGMENTED_DOWNLOAD', True)
+
+    def fail_run(*args, **kwargs):
+        raise AssertionError('yt-dlp should not be called for short tracks')
+
+    monkeypatch.setattr(subprocess, 'run', fail_run)
+    assert server.prepare_segmented_download('https://youtu.be/x', str(tmp_path), duration=200) == (None, None)
+
+
+def test_failed_conversion_removes_prefetched_stream(monkeypatch, tmp_path):
+    stream = tmp_path / 'Long mix.m4a'
+    info = tmp_path / 'abc.info.json'
+    stream.write_bytes(b'raw')
+    info.write_text('{}')
+    monkeypatch.setattr(server, 'prepare_segmented_download', lambda *args: (str(info), str(stream)))
+    monkeypatch.setattr(server, 'run_logged', lambda *args, **kwargs: 1)
+
+    ok = server.download_single_item({'url': 'https://youtu.be/x', 'title': 'Long mix'},
+                                     str(tmp_path), '192', server.JobLog())
+
+    assert not ok
+    assert not stream.exists()
+    assert not info.exists()
+    assert server.count_downloaded_files(str(tmp_path)) == 0
+
+
+def test_single_video_download_uses_per_track_path(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_download(video_info, output_folder, audio_quality, job_log, timeout=600):
+        calls.append((video_info, timeout))
+        open(os.path.join(output_folder, 'Long mix.mp3'), 'wb').close()
+        return True
+
+    class InlineExecutor:
+        def submit(self, fn, *args):
+            fn(*args)
+
+    monkeypatch.setattr(server, 'TEMP_DIR', str(tmp_path))
+    monkeypatch.setattr(server, 'executor', InlineExecutor())
+    monkeypatch.setattr(server, 'download_single_item', fake_download)
+
+    response = server.app.test_client().post('/api/start-download',
+                                             json={'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'})
+
+    download_id = response.get_json()['download_id']
+    assert calls == [({'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'title': 'dQw4w9WgXcQ'}, None)]
+    assert server.download_progress[download_id]['status'] == 'complete'
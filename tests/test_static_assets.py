@@ -0,0 +1,51 @@
+"""Tests for the hashed, precompressed static assets"""
+
+import gzip
+import os
+import re
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(server, 'STATIC_BUILD_DIR', str(tmp_path / 'build'))
+    monkeypatch.setattr(server, 'static_manifest', None)
+    return server.app.test_client()
+
+
+def asset_urls(client):
+    response = client.get('/', headers={'Accept-Encoding': 'identity'})
+    return re.findall(r'/assets/[^"]+', response.get_data(as_text=True))
+
+
+def test_assets_are_negotiated_and_immutable(client):
+    url = next(u for u in asset_urls(client) if u.endswith('.js'))
+
+    response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'immutable' in response.headers['Cache-Control']
+    with open(os.path.join(server.SCRIPT_DIR, 'app.js'), 'rb') as f:
+        assert gzip.decompress(response.data) == f.read()
+
+    cached = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': response.headers['ETag']})
+    assert cached.status_code == 304
+
+
+def test_rebuild_keeps_files_being_served(client):
+    urls = asset_urls(client)
+    server.build_static_assets()  # e.g. a second worker starting up
+
+    for url in urls:
+        assert client.get(url).status_code == 200
+
+
+def test_unbuildable_assets_fall_back_to_originals(client, monkeypatch):
+    urls = asset_urls(client)
+    monkeypatch.setattr(server, 'static_manifest', None)
+    monkeypatch.setattr(server, 'STATIC_BUILD_DIR', os.path.join(os.devnull, 'build'))
+
+    assert client.get('/').status_code == 200
+    assert client.get(urls[0]).status_code == 200
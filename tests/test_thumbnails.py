@@ -0,0 +1,124 @@
+"""Tests for the thumbnail proxy, using a local stub instead of YouTube"""
+
+import io
+import os
+import urllib.error
+
+import pytest
+
+import server
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def jpeg_bytes(size=(320, 180)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 0, 0)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class StubFetcher:
+    """Records upstream calls; ids starting with 'missing' 404, 'broken' ones raise"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, video_id):
+        self.calls.append(video_id)
+        if video_id.startswith('missing'):
+            return None
+        if video_id.startswith('broken'):
+            raise urllib.error.URLError('connection refused')
+        return jpeg_bytes()
+
+
+@pytest.fixture
+def fetcher(monkeypatch, tmp_path):
+    stub = StubFetcher()
+    monkeypatch.setattr(server, 'thumbnail_fetcher', stub)
+    monkeypatch.setattr(server, 'THUMB_CACHE_DIR', str(tmp_path / 'thumbs'))
+    monkeypatch.setattr(server, 'thumb_cache_size', None)
+    return stub
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+def image_size(response):
+    return Image.open(io.BytesIO(response.data)).size
+
+
+def test_upstream_is_fetched_once_per_id(fetcher, client):
+    for width in (120, 160, 320, 160):
+        assert client.get(f'/api/thumb/dQw4w9WgXcQ?w={width}').status_code == 200
+
+    assert fetcher.calls == ['dQw4w9WgXcQ']
+
+
+def test_width_snaps_to_allowed_sizes(fetcher, client):
+    assert image_size(client.get('/api/thumb/dQw4w9WgXcQ?w=150&format=jpeg')) == (160, 90)
+    assert image_size(client.get('/api/thumb/dQw4w9WgXcQ?w=50&format=jpeg')) == (120, 68)
+    assert image_size(client.get('/api/thumb/dQw4w9WgXcQ?w=9999&format=jpeg')) == (320, 180)
+
+
+def test_webp_is_picked_from_accept(fetcher, client):
+    webp = client.get('/api/thumb/dQw4w9WgXcQ', headers={'Accept': 'image/webp,*/*'})
+    jpeg = client.get('/api/thumb/dQw4w9WgXcQ', headers={'Accept': 'image/jpeg'})
+
+    assert webp.mimetype == 'image/webp'
+    assert jpeg.mimetype == 'image/jpeg'
+    assert 'max-age' in webp.headers['Cache-Control']
+    assert 'Accept' in webp.headers['Vary']
+
+
+def test_webp_needs_explicit_accept(fetcher, client):
+    old_safari = 'image/png,image/svg+xml,image/*;q=0.8,video/*;q=0.8,*/*;q=0.5'
+
+    assert client.get('/api/thumb/dQw4w9WgXcQ', headers={'Accept': old_safari}).mimetype == 'image/jpeg'
+    assert client.get('/api/thumb/dQw4w9WgXcQ', headers={'Accept': '*/*'}).mimetype == 'image/jpeg'
+    assert client.get('/api/thumb-sprite?ids=dQw4w9WgXcQ',
+                      headers={'Accept': old_safari}).mimetype == 'image/jpeg'
+
+
+def test_listings_use_small_thumbnails():
+    videos = server.parse_video_entries('{"id": "dQw4w9WgXcQ", "title": "Song"}\n')
+
+    assert videos[0]['thumbnail'] == '/api/thumb/dQw4w9WgXcQ?w=120'
+
+
+def test_missing_and_invalid_ids(fetcher, client):
+    assert client.get('/api/thumb/missing0000').status_code == 404
+    assert client.get('/api/thumb/bad').status_code == 400
+
+
+def test_sprite_reports_tile_size(fetcher, client):
+    response = client.get('/api/thumb-sprite?ids=dQw4w9WgXcQ,aaaaaaaaaaa,missing0000&w=120&format=webp')
+
+    assert response.status_code == 200
+    assert response.headers['X-Sprite-Tile'] == '120x67'
+    assert response.headers['X-Sprite-Columns'] == '3'
+    assert 'X-Sprite-Tile' in response.headers['Access-Control-Expose-Headers']
+    assert image_size(response) == (360, 67)
+    assert 'max-age' in response.headers['Cache-Control']
+
+
+def test_sprite_with_failing_tile_is_not_cached(fetcher, client):
+    response = client.get('/api/thumb-sprite?ids=dQw4w9WgXcQ,broken00000&w=120')
+
+    assert response.status_code == 200
+    assert 'no-cache' in response.headers['Cache-Control']
+    assert not [f for f in os.listdir(server.THUMB_CACHE_DIR) if f.startswith('sprite_')]
+
+
+def test_cache_evicts_oldest_files(fetcher, monkeypatch):
+    monkeypatch.setattr(server, 'THUMB_CACHE_MAX_BYTES', 2500)
+    for i in range(5):
+        path = os.path.join(server.THUMB_CACHE_DIR, f'file{i}.jpg')
+        server.write_thumb_cache(path, b'x' * 1000)
+        os.utime(path, (i, i))  # Make the write order the LRU order
+
+    remaining = sorted(os.listdir(server.THUMB_CACHE_DIR))
+    assert remaining == ['file3.jpg', 'file4.jpg']
+    assert server.thumb_cache_size <= 2500